@@ -1,4 +1,6 @@
 
+import json
+
 from aws_cdk import (
     App,
     CfnOutput,
@@ -6,6 +8,7 @@ from aws_cdk import (
     Environment,
     RemovalPolicy,
     Stack,
+    aws_athena as athena,
     aws_cloudwatch as cloudwatch,
     aws_cloudwatch_actions as cw_actions,
     aws_events as events,
@@ -16,6 +19,7 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_sns as sns,
     aws_sns_subscriptions as subscriptions,
+    aws_sqs as sqs,
     aws_stepfunctions as sfn,
     aws_stepfunctions_tasks as tasks,
 )
@@ -130,6 +134,14 @@ class TraitsETLStack(Stack):
         # Ingestion Lambda (SkillCorner API → S3)
         # ========================================
 
+        # Failed async invokes (after retries) land here instead of being dropped
+        self.ingestion_dlq = sqs.Queue(
+            self,
+            "IngestionDLQ",
+            queue_name="TraitsETL-IngestionDLQ",
+            retention_period=Duration.days(14),
+        )
+
         self.ingestion_lambda = lambda_.Function(
             self,
             "SkillCornerIngestionLambda",
@@ -139,6 +151,9 @@ class TraitsETLStack(Stack):
             role=self.lambda_role,
             timeout=Duration.seconds(60),
             memory_size=512,
+            dead_letter_queue=self.ingestion_dlq,
+            retry_attempts=2,
+            reserved_concurrent_executions=5,
             environment={
                 "INGESTION_BUCKET": self.ingestion_bucket.bucket_name,
             },
@@ -147,12 +162,18 @@ class TraitsETLStack(Stack):
             code=lambda_.Code.from_asset("lambda/skillcorner_ingestion"),
         )
 
+        # One warm instance behind an alias so the scheduled invoke skips the cold start
+        self.ingestion_alias = self.ingestion_lambda.current_version.add_alias(
+            "live",
+            provisioned_concurrent_executions=1,
+        )
+
         # Trigger the ingestion Lambda daily at 2am UTC
         self.daily_rule = events.Rule(
             self,
             "DailyIngestionTrigger",
             schedule=events.Schedule.cron(hour="2", minute="0"),
-            targets=[targets.LambdaFunction(self.ingestion_lambda)],
+            targets=[targets.LambdaFunction(self.ingestion_alias)],
         )
         # ========================================
         # Glue Data Catalog
@@ -187,6 +208,8 @@ class TraitsETLStack(Stack):
                 "--job-language": "python",
                 "--enable-glue-datacatalog": "true",
                 "--enable-metrics": "true",
+                # number_of_workers becomes a ceiling; Glue scales to the input
+                "--enable-auto-scaling": "true",
                 "--TempDir": f"s3://{self.analytics_bucket.bucket_name}/temp/",
                 "--INGESTION_BUCKET": self.ingestion_bucket.bucket_name,
                 "--ANALYTICS_BUCKET": self.analytics_bucket.bucket_name,
@@ -196,6 +219,11 @@ class TraitsETLStack(Stack):
             number_of_workers=10,
             timeout=30,
             max_retries=1,
+            # Allow overlapping runs (e.g. backfills) instead of failing with
+            # ConcurrentRunsExceededException at the default of 1
+            execution_property=glue.CfnJob.ExecutionPropertyProperty(
+                max_concurrent_runs=10,
+            ),
         )
 
         # Job 2: Gold – compute player-level metrics
@@ -213,13 +241,26 @@ class TraitsETLStack(Stack):
                 "--job-language": "python",
                 "--enable-glue-datacatalog": "true",
                 "--enable-metrics": "true",
+                "--enable-auto-scaling": "true",
                 "--ANALYTICS_BUCKET": self.analytics_bucket.bucket_name,
+                # Placeholder contract: gold_metrics.py (deployed to the script
+                # bucket, not part of this repo) is expected to read this and
+                # write gold tables with .partitionBy(...) on these keys so
+                # Athena can prune by competition and date
+                "--GOLD_PARTITION_KEYS": "competition_id,partition_date",
             },
             glue_version="4.0",
-            worker_type="G.2X",
-            number_of_workers=10,
+            # Aggregations are shuffle-bound rather than memory-bound: more, smaller
+            # workers for the same DPU ceiling as the bronze/silver job
+            worker_type="G.1X",
+            number_of_workers=20,
             timeout=30,
             max_retries=1,
+            # Allow overlapping runs (e.g. backfills) instead of failing with
+            # ConcurrentRunsExceededException at the default of 1
+            execution_property=glue.CfnJob.ExecutionPropertyProperty(
+                max_concurrent_runs=10,
+            ),
         )
 
         # ========================================
@@ -234,36 +275,82 @@ class TraitsETLStack(Stack):
             database_name=self.glue_database.ref,
             targets=glue.CfnCrawler.TargetsProperty(
                 s3_targets=[
+                    # Point at the table root so each competition_id=/partition_date=
+                    # folder is registered as a partition, not a separate table
+                    # (layout depends on the gold job honouring --GOLD_PARTITION_KEYS)
                     glue.CfnCrawler.S3TargetProperty(
-                        path=f"s3://{self.analytics_bucket.bucket_name}/gold/player_metrics/"
-                    ),
-                    glue.CfnCrawler.S3TargetProperty(
-                        path=f"s3://{self.analytics_bucket.bucket_name}/gold/player_sprints/"
-                    ),
-                    glue.CfnCrawler.S3TargetProperty(
-                        path=f"s3://{self.analytics_bucket.bucket_name}/gold/player_runs/"
-                    ),
-                    glue.CfnCrawler.S3TargetProperty(
-                        path=f"s3://{self.analytics_bucket.bucket_name}/gold/player_pressing/"
-                    ),
+                        path=f"s3://{self.analytics_bucket.bucket_name}/gold/{table}/",
+                        exclusions=["**/_SUCCESS", "**/_temporary/**"],
+                    )
+                    for table in (
+                        "player_metrics",
+                        "player_sprints",
+                        "player_runs",
+                        "player_pressing",
+                    )
                 ]
             ),
+            # Incremental crawls: only list folders added since the last run, so
+            # partition discovery doesn't rescan the whole gold prefix. Glue
+            # requires LOG/LOG schema handling in this mode; additive schema
+            # changes are applied by the gold job when it writes the tables.
+            recrawl_policy=glue.CfnCrawler.RecrawlPolicyProperty(
+                recrawl_behavior="CRAWL_NEW_FOLDERS_ONLY",
+            ),
             schema_change_policy=glue.CfnCrawler.SchemaChangePolicyProperty(
-                update_behavior="UPDATE_IN_DATABASE",
+                update_behavior="LOG",
                 delete_behavior="LOG",
             ),
+            # New partitions inherit the table schema instead of being re-inferred
+            configuration=json.dumps({
+                "Version": 1.0,
+                "CrawlerOutput": {
+                    "Partitions": {"AddOrUpdateBehavior": "InheritFromTable"},
+                },
+                "Grouping": {"TableGroupingPolicy": "CombineCompatibleSchemas"},
+            }),
+        )
+
+        # ========================================
+        # Athena Workgroup
+        # ========================================
+
+        # Engine v3 plans against the Glue catalog with partition pruning; a
+        # per-query scan cutoff stops unfiltered queries over every partition
+        self.athena_workgroup = athena.CfnWorkGroup(
+            self,
+            "AnalyticsWorkGroup",
+            name="traits-etl-analytics",
+            description="Athena workgroup for querying gold player metrics",
+            work_group_configuration=athena.CfnWorkGroup.WorkGroupConfigurationProperty(
+                engine_version=athena.CfnWorkGroup.EngineVersionProperty(
+                    selected_engine_version="Athena engine version 3",
+                ),
+                result_configuration=athena.CfnWorkGroup.ResultConfigurationProperty(
+                    output_location=f"s3://{self.analytics_bucket.bucket_name}/athena-results/",
+                ),
+                enforce_work_group_configuration=True,
+                publish_cloud_watch_metrics_enabled=True,
+                bytes_scanned_cutoff_per_query=10 * 1024**3,  # 10 GB
+            ),
         )
 
         # ========================================
         # Step Functions State Machine
         # ========================================
 
-        # Glue tasks
+        # Glue tasks – run once per match inside the PerMatch map below
+        match_arguments = sfn.TaskInput.from_object({
+            "--MATCH_ID": sfn.JsonPath.string_at("$.match_id"),
+            "--partition_date": sfn.JsonPath.string_at("$.partition_date"),
+        })
+
         bronze_silver_task = tasks.GlueStartJobRun(
             self,
             "BronzeSilverTask",
             glue_job_name=self.bronze_silver_job.name,
             integration_pattern=sfn.IntegrationPattern.RUN_JOB,
+            arguments=match_arguments,
             result_path="$.bronze_silver_result",
         )
 
@@ -272,9 +359,19 @@ class TraitsETLStack(Stack):
             "GoldMetricsTask",
             glue_job_name=self.gold_metrics_job.name,
             integration_pattern=sfn.IntegrationPattern.RUN_JOB,
+            arguments=match_arguments,
             result_path="$.gold_metrics_result",
         )
 
+        # Back off and retry when Glue throttles or hits the concurrent-run limit
+        for glue_task in (bronze_silver_task, gold_metrics_task):
+            glue_task.add_retry(
+                errors=["Glue.ConcurrentRunsExceededException", "Glue.AWSGlueException"],
+                interval=Duration.seconds(10),
+                max_attempts=5,
+                backoff_rate=2.0,
+            )
+
         crawler_task = tasks.GlueStartCrawler(
             self,
             "RunCrawlerTask",
@@ -309,13 +406,30 @@ class TraitsETLStack(Stack):
             result_path="$.notification",
         )
 
-        # Basic linear workflow: BronzeSilver → GoldMetrics → Crawler → Notify
-        definition = bronze_silver_task.next(gold_metrics_task).next(crawler_task).next(
-            notify_success
+        # Matches are independent, so fan BronzeSilver → GoldMetrics out over the
+        # execution input's match_ids (the ingestion Lambda passes the IDs it
+        # fetched). max_concurrency stays under the Glue max_concurrent_runs.
+        per_match = sfn.Map(
+            self,
+            "PerMatch",
+            items_path="$.match_ids",
+            # Each iteration only sees what is selected here, so carry the
+            # execution's partition_date alongside the match_id
+            item_selector={
+                "match_id": sfn.JsonPath.string_at("$$.Map.Item.Value"),
+                "partition_date": sfn.JsonPath.string_at("$.partition_date"),
+            },
+            max_concurrency=5,
+            result_path="$.per_match_results",
         )
+        per_match.item_processor(bronze_silver_task.next(gold_metrics_task))
+
+        # Catch-all error path, for the per-match jobs and the crawler
+        per_match.add_catch(notify_failure, result_path="$.error")
+        crawler_task.add_catch(notify_failure, result_path="$.error")
 
-        # Catch-all error path
-        definition = definition.add_catch(notify_failure, result_path="$.error")
+        # PerMatch → Crawler → Notify
+        definition = per_match.next(crawler_task).next(notify_success)
 
         self.state_machine = sfn.StateMachine(
             self,
@@ -347,6 +461,21 @@ class TraitsETLStack(Stack):
         )
         self.failure_alarm.add_alarm_action(cw_actions.SnsAction(self.notifications_topic))
 
+        # Alarm: Ingestion invokes that exhausted their retries
+        self.ingestion_dlq_alarm = cloudwatch.Alarm(
+            self,
+            "IngestionDLQAlarm",
+            alarm_name="TraitsETL-IngestionDLQ",
+            metric=self.ingestion_dlq.metric_approximate_number_of_messages_visible(
+                period=Duration.minutes(5),
+                statistic="Maximum",
+            ),
+            threshold=1,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+        )
+        self.ingestion_dlq_alarm.add_alarm_action(cw_actions.SnsAction(self.notifications_topic))
+
         # ========================================
         # Outputs
         # ========================================
@@ -356,6 +485,8 @@ class TraitsETLStack(Stack):
         CfnOutput(self, "ScriptBucketName", value=self.script_bucket.bucket_name)
         CfnOutput(self, "StateMachineArn", value=self.state_machine.state_machine_arn)
         CfnOutput(self, "GlueDatabaseName", value=self.glue_database.ref)
+        CfnOutput(self, "AthenaWorkGroupName", value=self.athena_workgroup.ref)
+        CfnOutput(self, "IngestionDLQUrl", value=self.ingestion_dlq.queue_url)
         CfnOutput(self, "NotificationsTopicArn", value=self.notifications_topic.topic_arn)
 
 
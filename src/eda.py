@@ -5,6 +5,7 @@ These functions process raw tracking data (nested JSONL structure)
 and calculate player-level metrics like distance and speed.
 """
 
+import bottleneck as bn
 import pandas as pd
 import numpy as np
 
@@ -17,32 +18,44 @@ SECONDS_TO_HOURS = 3600
 def explode_player_tracking(tracking_df: pd.DataFrame) -> pd.DataFrame:
     """
     Flatten nested player_data from tracking DataFrame.
-    Returns one row per player per frame.
+    Returns one row per player per frame, with player_id as int32.
+
+    Note: player entries without a player_id are dropped (they can't be
+    attributed to anyone), so row counts can be lower than one per entry.
     """
-    rows = []
+    # One row per (frame, player dict) via pandas' C-level explode
+    exploded = tracking_df[["frame", "timestamp", "period", "player_data"]].explode(
+        "player_data", ignore_index=True
+    )
 
-    for idx, row in tracking_df.iterrows():
-        frame = row["frame"]
-        timestamp = row["timestamp"]
-        period = row["period"]
-
-        # player_data is a list of dicts
-        if isinstance(row["player_data"], list):
-            for player in row["player_data"]:
-                if isinstance(player, dict):
-                    rows.append(
-                        {
-                            "frame": frame,
-                            "timestamp": timestamp,
-                            "period": period,
-                            "player_id": player.get("player_id"),
-                            "x": player.get("x"),
-                            "y": player.get("y"),
-                            "is_detected": player.get("is_detected"),
-                        }
-                    )
+    # Empty lists / missing player_data explode to NaN - keep real dicts only
+    exploded = exploded[exploded["player_data"].map(type).eq(dict)]
 
-    return pd.DataFrame(rows)
+    # Build the player columns in one shot (missing keys become NaN)
+    players = pd.DataFrame.from_records(
+        exploded["player_data"].tolist(),
+        columns=["player_id", "x", "y", "is_detected"],
+    )
+
+    # Rows without a player_id can't be attributed to anyone; dropping them
+    # lets player_id be a compact int32 key
+    has_player = players["player_id"].notna().to_numpy()
+    players = players[has_player].astype({"player_id": "int32"})
+    exploded = exploded[has_player]
+
+    return pd.concat(
+        [
+            exploded.drop(columns=["player_data"]).reset_index(drop=True),
+            players.reset_index(drop=True),
+        ],
+        axis=1,
+    )
+
+
+def select_player_frames(player_tracking: pd.DataFrame, player_id: int) -> pd.DataFrame:
+    """Return one player's rows from flattened tracking."""
+    # Read-only slice: compare on the raw array to skip Series alignment
+    return player_tracking.loc[player_tracking["player_id"].to_numpy() == player_id]
 
 
 def calculate_distances(player_tracking: pd.DataFrame) -> pd.Series:
@@ -52,37 +65,77 @@ def calculate_distances(player_tracking: pd.DataFrame) -> pd.Series:
     
     Note: Sorted by frame first, otherwise distances will be wrong.
     """
-    # Sort by frame to ensure chronological order
-    sorted_df = player_tracking.sort_values("frame").copy()
+    xy = player_tracking[["x", "y"]].to_numpy(dtype=np.float32)
+    index = player_tracking.index
 
-    # Calculate position differences
-    dx = sorted_df["x"].diff()
-    dy = sorted_df["y"].diff()
+    # Sort by frame to ensure chronological order (stable, like sort_values);
+    # exploded tracking is usually frame-ordered already, so check first
+    frames = player_tracking["frame"].to_numpy()
+    if not (np.diff(frames) >= 0).all():
+        order = np.argsort(frames, kind="stable")
+        xy = xy[order]
+        index = index[order]
 
-    # Euclidean distance
-    distances = np.sqrt(dx**2 + dy**2)
+    # Euclidean distance in one hypot pass over float32 positions
+    distances = np.empty(len(xy), dtype=np.float32)
+    if len(xy) > 0:
+        distances[0] = np.nan
+        np.hypot(np.diff(xy[:, 0]), np.diff(xy[:, 1]), out=distances[1:])
 
-    return distances
+    return pd.Series(distances, index=index)
+
+
+def calculate_distances_by_player(player_tracking: pd.DataFrame) -> pd.Series:
+    """
+    Calculate frame-to-frame distances for every player in one vectorised pass.
+    Returns distances in meters (NaN on each player's first frame).
+
+    Note: Expects rows sorted by (player_id, frame).
+    """
+    player_ids = player_tracking["player_id"].to_numpy()
+    xy = player_tracking[["x", "y"]].to_numpy(dtype=np.float32)
+
+    distances = np.full(len(xy), np.nan, dtype=np.float32)
+    if len(xy) > 1:
+        np.hypot(np.diff(xy[:, 0]), np.diff(xy[:, 1]), out=distances[1:])
+        # Don't carry a delta across the boundary between two players
+        distances[1:][player_ids[1:] != player_ids[:-1]] = np.nan
+
+    return pd.Series(distances, index=player_tracking.index)
 
 
 def calculate_speeds(
-    player_tracking: pd.DataFrame, fps: int = TRACKING_FPS
+    player_tracking: pd.DataFrame,
+    fps: int = TRACKING_FPS,
+    distances: pd.Series | None = None,
 ) -> pd.Series:
     """
     Calculate instantaneous speed (km/h) from position deltas.
+    Pass precomputed calculate_distances() output to avoid recomputing it.
     
     Note: Gaps in tracking may cause spikes - filter those out upstream.
     """
-    distances = calculate_distances(player_tracking)
+    if distances is None:
+        distances = calculate_distances(player_tracking)
+
+    # Metres per frame -> m/s -> km/h in a single scale
+    return distances * (fps * SECONDS_TO_HOURS / METERS_TO_KM)
 
-    # Time between frames in seconds
-    time_delta = 1.0 / fps
 
-    # Speed in m/s, convert to km/h
-    speeds_ms = distances / time_delta
-    speeds_kmh = speeds_ms * (SECONDS_TO_HOURS / METERS_TO_KM)  # * 3.6
+def calculate_movement_profile(
+    player_tracking: pd.DataFrame, fps: int = TRACKING_FPS
+) -> tuple[float, float]:
+    """
+    Total distance (m) and robust max speed (km/h) for one player.
+    Distances are computed once and speeds derived from the same array.
+    """
+    distances = calculate_distances(player_tracking).to_numpy()
+    speeds = distances * (fps * SECONDS_TO_HOURS / METERS_TO_KM)
+
+    # Filter out NaNs and obviously impossible speeds
+    valid_speeds = speeds[(speeds > 0) & (speeds < 40)]
 
-    return speeds_kmh
+    return float(np.nansum(distances)), clean_max_speed_kmh(valid_speeds)
 
 
 def get_player_summary(
@@ -96,7 +149,7 @@ def get_player_summary(
     Uses official minutes_played from metadata if available, falls back to tracking.
     """
 
-    player_data = player_tracking[player_tracking["player_id"] == player_id].copy()
+    player_data = select_player_frames(player_tracking, player_id)
 
     if len(player_data) == 0:
         return {
@@ -108,11 +161,7 @@ def get_player_summary(
             "minutes_played": 0.0,
         }
 
-    distances = calculate_distances(player_data)
-    speeds = calculate_speeds(player_data)
-
-    # Filter out NaNs and obviously impossible speeds
-    valid_speeds = speeds[(speeds > 0) & (speeds < 40)]
+    total_distance_m, max_speed_kmh = calculate_movement_profile(player_data, fps)
 
     # Minutes played from metadata if available, else from tracking
     if minutes_played_lookup and player_id in minutes_played_lookup:
@@ -121,7 +170,7 @@ def get_player_summary(
         on_pitch_frames = player_data["is_detected"].fillna(False).sum()
         minutes_played = on_pitch_frames / (fps * 60)
 
-    total_distance_km = distances.sum() / METERS_TO_KM
+    total_distance_km = total_distance_m / METERS_TO_KM
     hours_played = minutes_played / 60
     avg_speed_kmh = total_distance_km / hours_played if hours_played > 0 else 0.0
 
@@ -130,13 +179,13 @@ def get_player_summary(
         "distance_km": total_distance_km,
         "avg_speed_kmh": avg_speed_kmh,
         # Use robust max instead of raw single-frame max
-        "max_speed_kmh": clean_max_speed_kmh(valid_speeds),
+        "max_speed_kmh": max_speed_kmh,
         "frames_tracked": len(player_data),
         "minutes_played": minutes_played,
     }
     
 def clean_max_speed_kmh(
-    speeds: pd.Series,
+    speeds: pd.Series | np.ndarray,
     window: int = 3,
     upper_cap: float = 40.0,
     quantile: float = 0.99,
@@ -148,17 +197,24 @@ def clean_max_speed_kmh(
     if speeds is None:
         return 0.0
 
-    valid = speeds.dropna()
-    valid = valid[(valid > 0) & (valid < upper_cap)]
+    # Work on the raw array; NaNs fail both comparisons and drop out here
+    speeds = np.asarray(speeds, dtype=np.float64)
+    valid = speeds[(speeds > 0) & (speeds < upper_cap)]
 
-    if valid.empty:
+    if valid.size == 0:
         return 0.0
 
-    smoothed = valid.rolling(window=window, center=True, min_periods=1).median()
+    # Centred rolling median: bottleneck's trailing move_median over a
+    # NaN-padded tail, shifted back by the centre offset
+    offset = (window - 1) // 2
+    padded = np.concatenate([valid, np.full(offset, np.nan)])
+    smoothed = bn.move_median(
+        padded, window=min(window, len(padded)), min_count=1
+    )[offset:]
 
     # Use a high percentile to mirror the idea behind psv99 and
     # avoid single-frame outliers.
-    return float(smoothed.quantile(quantile))
+    return float(np.quantile(smoothed, quantile))
 
 
 def enrich_with_physical(df: pd.DataFrame,
@@ -198,17 +254,18 @@ def sample_players_by_position(
     Return up to n_per_group player_ids per position_group that
     actually appear in the given match tracking data.
     """
-    return (
+    tracked_ids = player_tracking["player_id"].unique()
+
+    context = (
         physical_context[["player_id", "position_group"]]
         .dropna(subset=["position_group"])
         .drop_duplicates("player_id")
-        .merge(
-            player_tracking[["player_id"]].drop_duplicates(),
-            on="player_id",
-            how="inner",
-        )
-        .sort_values(["position_group", "player_id"])
-        .groupby("position_group")
+    )
+    context = context[context["player_id"].isin(tracked_ids)]
+
+    return (
+        context.sort_values(["position_group", "player_id"])
+        .groupby("position_group", sort=False, observed=True)
         .head(n_per_group)["player_id"]
         .tolist()
     )
@@ -218,38 +275,53 @@ def summarise_match_distance(
     player_ids: list[int],
     match_meta: dict | None = None,
     fps: int = 10,
+    minutes_played_lookup: dict | None = None,
 ) -> pd.DataFrame:
     """
     Compute total distance and metres-per-minute for each player using
     official minutes_played from match metadata when available, falling
     back to tracking-derived minutes if needed.
+
+    Pass minutes_played_lookup (see loaders.load_minutes_played_lookup) to
+    skip reading it out of the full match_meta dict.
     """
 
-    # Build lookup only if metadata provided
-    minutes_played_lookup = {}
-    if match_meta is not None:
+    # Build lookup only if metadata provided and no lookup was passed in
+    if minutes_played_lookup is None:
+        minutes_played_lookup = {}
+    if match_meta is not None and not minutes_played_lookup:
         minutes_played_lookup = {
             p["id"]: p.get("playing_time", {}).get("total", {}).get("minutes_played")
             for p in match_meta.get("players", [])
             if p.get("playing_time") and p["playing_time"].get("total")
         }
 
+    # One pass over the selected players instead of a filter per player
+    subset = player_tracking[player_tracking["player_id"].isin(player_ids)]
+    subset = subset.sort_values(["player_id", "frame"], kind="stable")
+
+    grouped = subset.assign(
+        distance_m=calculate_distances_by_player(subset),
+        detected=subset["is_detected"].eq(True),
+    ).groupby("player_id", sort=False)
+
+    total_distance_lookup = grouped["distance_m"].sum().astype(float)
+    frames_detected_lookup = grouped["detected"].sum()
+
     rows = []
 
     for pid in player_ids:
-        df_player = player_tracking[player_tracking["player_id"] == pid]
-        if df_player.empty:
+        if pid not in total_distance_lookup.index:
             continue
 
-        dists = calculate_distances(df_player)
-        total_distance_m = dists.sum()
+        total_distance_m = total_distance_lookup[pid]
 
         # Prefer official minutes played
         minutes_match = minutes_played_lookup.get(pid)
 
         # Fallback to tracking frames
         if minutes_match is None:
-            frames_detected = df_player["is_detected"].fillna(False).sum()
+            frames_detected = frames_detected_lookup[pid]
             minutes_match = frames_detected / (fps * 60)
 
         meters_per_min = (
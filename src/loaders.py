@@ -4,10 +4,19 @@ Data loaders for SkillCorner A-League tracking data.
 
 import json
 import logging
+import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
 
+import ijson
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.eda import explode_player_tracking
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,6 +25,9 @@ PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data" / "opendata" / "data" / "matches"
 MATCHES_JSON = PROJECT_ROOT / "data" / "opendata" / "data" / "matches.json"
 
+# Bump when the flattening or dtypes of the cached player tracking change
+TRACKING_CACHE_VERSION = 1
+
 def load_physical_aggregates() -> pd.DataFrame:
     """Load the A-League physical aggregates dataset."""
     agg_path = (
@@ -28,8 +40,13 @@ def load_physical_aggregates() -> pd.DataFrame:
     )
     return pd.read_csv(agg_path)
 
+@lru_cache(maxsize=64)
 def load_match_metadata(match_id: str) -> Dict:
-    """Load match.json file - contains teams, players, pitch dimensions."""
+    """
+    Load match.json file - contains teams, players, pitch dimensions.
+
+    Cached per match_id, so treat the returned dict as read-only.
+    """
     file_path = DATA_DIR / match_id / f"{match_id}_match.json"
     
     if not file_path.exists():
@@ -39,6 +56,28 @@ def load_match_metadata(match_id: str) -> Dict:
         return json.load(f)
 
 
+def load_minutes_played_lookup(match_id: str) -> Dict[int, float]:
+    """
+    Map player id -> official minutes_played from match.json.
+
+    Streams only the players array, so the rest of the metadata is never
+    built into Python objects.
+    """
+    file_path = DATA_DIR / match_id / f"{match_id}_match.json"
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"Match file not found: {file_path}")
+
+    minutes_played_lookup = {}
+    with open(file_path, "rb") as f:
+        for player in ijson.items(f, "players.item", use_float=True):
+            playing_time = player.get("playing_time")
+            if playing_time and playing_time.get("total"):
+                minutes_played_lookup[player["id"]] = playing_time["total"].get("minutes_played")
+
+    return minutes_played_lookup
+
+
 def load_tracking_data(match_id: str) -> pd.DataFrame:
     """
     Load tracking_extrapolated.jsonl - frame-by-frame positions at 10fps.
@@ -51,8 +90,99 @@ def load_tracking_data(match_id: str) -> pd.DataFrame:
     if not file_path.exists():
         raise FileNotFoundError(f"Tracking file not found: {file_path}")
     
-    # JSONL = one JSON object per line
-    return pd.read_json(file_path, lines=True)
+    # JSONL = one JSON object per line; orjson parses each line in C and the
+    # frame is built once from the records
+    with open(file_path, "rb") as f:
+        records = [orjson.loads(line) for line in f if line.strip()]
+
+    return pd.DataFrame.from_records(records)
+
+
+def tracking_cache_fingerprint(source_path: Path) -> Dict[bytes, bytes]:
+    """Parquet metadata tying a tracking cache to its source file and cache version."""
+    stat = source_path.stat()
+    return {
+        b"cache_version": str(TRACKING_CACHE_VERSION).encode(),
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+        b"source_size": str(stat.st_size).encode(),
+    }
+
+
+def tracking_cache_is_fresh(cache_path: Path, fingerprint: Dict[bytes, bytes]) -> bool:
+    """True if cache_path exists and was built from the fingerprinted source."""
+    if not cache_path.exists():
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return all(metadata.get(key) == value for key, value in fingerprint.items())
+
+
+def load_player_tracking(
+    match_id: str,
+    player_id: int | None = None,
+    period: int | None = None,
+    columns: List[str] | None = None,
+    cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Load flattened player tracking (one row per player per frame).
+
+    The first call parses the JSONL, explodes player_data and writes
+    {match_id}_tracking.parquet next to it, sorted by (player_id, frame);
+    later calls read the Parquet. player_id / period filters and columns are
+    pushed down to the Parquet reader, so row groups for other players are
+    skipped. The cache is rebuilt when the JSONL's mtime/size or
+    TRACKING_CACHE_VERSION no longer match the ones stored in it.
+    """
+    source_path = DATA_DIR / match_id / f"{match_id}_tracking_extrapolated.jsonl"
+    cache_path = DATA_DIR / match_id / f"{match_id}_tracking.parquet"
+
+    filters = []
+    if player_id is not None:
+        filters.append(("player_id", "=", player_id))
+    if period is not None:
+        filters.append(("period", "=", period))
+
+    fingerprint = tracking_cache_fingerprint(source_path) if cache and source_path.exists() else None
+    if fingerprint is not None and tracking_cache_is_fresh(cache_path, fingerprint):
+        logger.info(f"Using cached player tracking: {cache_path}")
+        return pd.read_parquet(cache_path, columns=columns, filters=filters or None)
+
+    player_tracking = explode_player_tracking(load_tracking_data(match_id))
+    player_tracking = player_tracking.astype({
+        "frame": np.int32,
+        "player_id": np.int32,
+        "x": np.float32,
+        "y": np.float32,
+    })
+
+    # Sorted rows give each row group a narrow player_id range to prune on
+    player_tracking = player_tracking.sort_values(
+        ["player_id", "frame"], kind="stable", ignore_index=True
+    )
+
+    if fingerprint is not None:
+        table = pa.Table.from_pandas(player_tracking, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **fingerprint})
+
+        # Write to a per-process temp file and swap it in, so concurrent
+        # workers never read or leave behind a half-written cache
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp_path, compression="zstd", row_group_size=50_000)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Cached player tracking: {cache_path}")
+
+        # Serve the fresh cache the same way as a hit, so both paths filter alike
+        return pd.read_parquet(cache_path, columns=columns, filters=filters or None)
+
+    if filters:
+        mask = np.ones(len(player_tracking), dtype=bool)
+        for column, _, value in filters:
+            mask &= player_tracking[column].to_numpy() == value
+        player_tracking = player_tracking.loc[mask].reset_index(drop=True)
+    return player_tracking if columns is None else player_tracking[columns]
 
 
 def load_dynamic_events(match_id: str) -> pd.DataFrame:
@@ -78,8 +208,13 @@ def load_phases(match_id: str) -> pd.DataFrame:
     return pd.read_csv(file_path)
 
 
+@lru_cache(maxsize=None)
 def get_all_match_ids() -> List[str]:
-    """Get list of all match IDs from matches.json or filesystem."""
+    """
+    Get list of all match IDs from matches.json or filesystem.
+
+    Cached after the first call, so treat the returned list as read-only.
+    """
     # Try matches.json first
     if MATCHES_JSON.exists():
         try:
@@ -129,4 +264,4 @@ def load_all_matches() -> Dict[str, Dict]:
             continue
     
     logger.info(f"Loaded {len(all_data)}/{len(match_ids)} matches")
-    return all_data
\ No newline at end of file
+    return all_data
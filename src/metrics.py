@@ -7,16 +7,167 @@ This module provides functions for:
 - PySpark aggregations for player-level metrics
 """
 
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import bottleneck as bn
 import pandas as pd
 import numpy as np
+from pyspark import StorageLevel
 from pyspark.sql import DataFrame as SparkDataFrame
+from pyspark.sql import SparkSession
 from pyspark.sql import functions as F
-from src.eda import explode_player_tracking, calculate_distances
+from src.eda import explode_player_tracking, calculate_distances_by_player
+from src.loaders import load_player_tracking
+
+logger = logging.getLogger(__name__)
 
 TRACKING_FPS = 10
 SPRINT_THRESHOLD_KMH = 24.5
 MAX_PHYSICAL_SPEED_KMH = 36.0
 TELEPORT_THRESHOLD_M = 1.5  # >1.5m per frame ≈ teleport at 10fps
+HIGH_VALUE_PHASES = frozenset({'create', 'finish', 'quick_break', 'transition'})
+
+
+def smooth_speeds_by_player(
+    speeds: np.ndarray,
+    player_ids: np.ndarray,
+    median_window: int = 11,
+    mean_window: int = 7,
+) -> np.ndarray:
+    """
+    Centred rolling median followed by a centred rolling mean, per player.
+
+    Same result as rolling(median_window, center=True, min_periods=1).median()
+    then rolling(mean_window, ...).mean() for each player, but all players
+    share one NaN-padded array so each pass is a single bottleneck call.
+    Expects rows sorted by (player_id, frame).
+    """
+    if len(speeds) == 0:
+        return np.asarray(speeds, dtype=np.float64)
+
+    median_offset = (median_window - 1) // 2
+    mean_offset = (mean_window - 1) // 2
+    gap = max(median_offset, mean_offset)
+
+    # Each player starts `gap` NaN slots after the previous one ends
+    player_index = np.zeros(len(speeds), dtype=np.int64)
+    np.cumsum(player_ids[1:] != player_ids[:-1], out=player_index[1:])
+    positions = np.arange(len(speeds)) + gap * player_index
+
+    padded = np.full(positions[-1] + gap + 1, np.nan)
+    padded[positions] = speeds
+
+    # bottleneck windows trail, so each centred value sits `offset` slots
+    # later; shift the medians back in place, leaving the gaps NaN again
+    medians = bn.move_median(padded, window=min(median_window, len(padded)), min_count=1)
+    padded.fill(np.nan)
+    padded[positions] = medians[positions + median_offset]
+
+    means = bn.move_mean(padded, window=min(mean_window, len(padded)), min_count=1)
+    return means[positions + mean_offset]
+
+
+def segment_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Sum values[start:end] for each (start, end) pair with a single reduceat.
+
+    Segments must be non-empty and in increasing order.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=values.dtype)
+
+    # Interleave starts/ends and keep every other sum; the appended zero keeps
+    # an end at len(values) a valid index
+    bounds = np.column_stack([starts, ends]).ravel()
+    return np.add.reduceat(np.append(values, 0), bounds)[::2]
+
+
+def segment_quantiles(
+    values: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    q: float,
+) -> np.ndarray:
+    """
+    Linear-interpolated quantile of values[start:end] for each segment, NaNs ignored.
+
+    Same result as np.nanquantile per segment, but all segments are sorted in
+    one lexsort. Segments with no valid values return NaN.
+    """
+    lengths = ends - starts
+    labels = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    segment_values = values[np.repeat(starts, lengths) + offsets]
+
+    valid = ~np.isnan(segment_values)
+    segment_values, labels = segment_values[valid], labels[valid]
+
+    # Sort within segments: labels are the primary key, values the secondary
+    sorted_values = segment_values[np.lexsort((segment_values, labels))]
+    counts = np.bincount(labels, minlength=len(starts))
+    first = np.cumsum(counts) - counts
+
+    result = np.full(len(starts), np.nan)
+    has_values = counts > 0
+    position = q * (counts[has_values] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[has_values] - 1)
+    low_values = sorted_values[first[has_values] + lower]
+    high_values = sorted_values[first[has_values] + upper]
+    result[has_values] = low_values + (high_values - low_values) * (position - lower)
+
+    return result
+
+
+def prepare_sprint_speeds(
+    tracking_df: pd.DataFrame,
+    fps: int = TRACKING_FPS,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten, clean and smooth tracking speeds for sprint detection.
+
+    Returns (frames, player_ids, smoothed km/h) sorted by (player_id, frame).
+    Pass the result to detect_sprints_from_speeds to try several thresholds
+    without repeating this work.
+    """
+    # Accept raw tracking or an already-flattened table (e.g. load_player_tracking)
+    if "player_data" in tracking_df.columns:
+        player_frames = explode_player_tracking(tracking_df)
+    else:
+        player_frames = tracking_df
+    # Only the columns used below, so the sort and filter don't copy the rest
+    player_frames = player_frames.loc[
+        player_frames["player_id"].notna(), ["player_id", "frame", "x", "y"]
+    ]
+    player_frames = player_frames.sort_values(["player_id", "frame"]).reset_index(drop=True)
+
+    smooth_window = 11  # Longer window for more aggressive smoothing
+
+    # Drop players with too few frames to smooth
+    frame_counts = player_frames.groupby("player_id", sort=False)["frame"].transform("size")
+    player_frames = player_frames[frame_counts.to_numpy() >= smooth_window].reset_index(drop=True)
+
+    # Calculate distances and speeds for every player at once
+    distances = calculate_distances_by_player(player_frames).to_numpy()
+
+    # Remove teleports (>1.0m per frame = >36 km/h)
+    distances = np.where(distances > 1.0, np.nan, distances)
+
+    # Convert to km/h
+    speeds_kmh = distances * fps * 3.6
+
+    # First pass: cap at 32 km/h (reasonable PSV99 range)
+    speeds_kmh = np.minimum(speeds_kmh, 32.0)
+
+    # Heavy smoothing: rolling median then rolling mean
+    player_ids = player_frames["player_id"].to_numpy()
+    speed_smooth = smooth_speeds_by_player(speeds_kmh, player_ids, smooth_window, 7)
+
+    frames = player_frames["frame"].to_numpy()
+
+    return frames, player_ids, speed_smooth
 
 
 def detect_sprints(
@@ -33,103 +184,135 @@ def detect_sprints(
     - Realistic speed caps based on PSV99 data
     - Strict validation of sprint characteristics
     """
-    
-    player_frames = explode_player_tracking(tracking_df)
-    player_frames = player_frames.sort_values(["player_id", "frame"]).reset_index(drop=True)
+    prepared = prepare_sprint_speeds(tracking_df, fps)
+    return detect_sprints_from_speeds(prepared, match_id, fps, threshold_kmh)
 
-    sprints_list = []
-    smooth_window = 11  # Longer window for more aggressive smoothing
 
-    for player_id in player_frames["player_id"].dropna().unique():
-        pdf = player_frames[player_frames["player_id"] == player_id].copy()
-        if len(pdf) < smooth_window:
-            continue
+def detect_sprints_from_speeds(
+    prepared: tuple[np.ndarray, np.ndarray, np.ndarray],
+    match_id: str,
+    fps: int = TRACKING_FPS,
+    threshold_kmh: float = SPRINT_THRESHOLD_KMH,
+) -> pd.DataFrame:
+    """
+    Detect sprints from the output of prepare_sprint_speeds.
 
-        # Calculate distances and speeds
-        distances = calculate_distances(pdf)
-        
-        # Remove teleports (>1.0m per frame = >36 km/h)
-        teleport_mask = distances > 1.0
-        distances = distances.mask(teleport_mask, np.nan)
-        
-        # Convert to km/h
-        speeds_ms = distances * fps
-        speeds_kmh = speeds_ms * 3.6
-        
-        # First pass: cap at 32 km/h (reasonable PSV99 range)
-        speeds_kmh = speeds_kmh.clip(upper=32.0)
-        
-        # Heavy smoothing: rolling median then rolling mean
-        speeds_smooth = (
-            speeds_kmh.rolling(window=smooth_window, center=True, min_periods=1)
-            .median()
-        )
-        speeds_smooth = (
-            speeds_smooth.rolling(window=7, center=True, min_periods=1)
-            .mean()
-        )
-        
-        pdf["speed_smooth"] = speeds_smooth
-        
-        # Detect sprint frames
-        pdf["is_sprinting"] = pdf["speed_smooth"].fillna(0) >= threshold_kmh
-        
-        # Group consecutive sprint frames
-        pdf["sprint_group"] = (
-            pdf["is_sprinting"] != pdf["is_sprinting"].shift()
-        ).cumsum()
-        
-        sprint_groups = pdf[pdf["is_sprinting"]].groupby("sprint_group")
-        
-        for _, sprint in sprint_groups:
-            if len(sprint) < 6:  # Minimum 0.6s
-                continue
-            
-            frame_start = int(sprint["frame"].min())
-            frame_end = int(sprint["frame"].max())
-            mid_frame = int((frame_start + frame_end) / 2)
-            
-            duration_s = (frame_end - frame_start + 1) / fps
-            
-            # Get smoothed speeds for this sprint
-            sprint_speeds = sprint["speed_smooth"].dropna()
-            if sprint_speeds.empty or len(sprint_speeds) < 4:
-                continue
-            
-            # Use conservative percentiles
-            avg_speed_kmh = float(sprint_speeds.mean())
-            max_speed_kmh = float(sprint_speeds.quantile(0.90))  # 90th percentile
-            
-            # Distance from average speed
-            distance_m = (avg_speed_kmh / 3.6) * duration_s
-            
-            # Realistic validation based on PSV99 data:
-            # - Average sprint speed should be 25-29 km/h (sustained effort)
-            # - Max sprint speed should be 26-31 km/h (brief peak)
-            if avg_speed_kmh < 24.5 or avg_speed_kmh > 29:
-                continue
-            if max_speed_kmh < 26.0 or max_speed_kmh > 33.0:
-                continue
-            if distance_m < 7.0:  # Meaningful sprint distance, as SkillCorner defines sprint velocity as 7 m/s
-                continue
-            
-            sprints_list.append({
-                "match_id": match_id,
-                "player_id": player_id,
-                "frame_start": frame_start,
-                "frame_end": frame_end,
-                "mid_frame": mid_frame,
-                "duration_s": duration_s,
-                "distance_m": distance_m,
-                "avg_sprint_speed_kmh": avg_speed_kmh,
-                "max_sprint_speed_kmh": max_speed_kmh,
-            })
-    
-    sprints_df = pd.DataFrame(sprints_list)
-    if not sprints_df.empty:
-        sprints_df["sprint_id"] = range(len(sprints_df))
-    
-    return sprints_df
+    Lets threshold sweeps prepare the speeds once and reuse them:
+        prepared = prepare_sprint_speeds(tracking_df)
+        for threshold in thresholds:
+            sprints = detect_sprints_from_speeds(prepared, match_id, threshold_kmh=threshold)
+    fps must match the one used to prepare the speeds.
+    """
+    frames, player_ids, speed_smooth = prepared
+
+    # Detect sprint frames
+    is_sprinting = np.nan_to_num(speed_smooth, nan=0.0) >= threshold_kmh
+
+    # Group consecutive sprint frames into runs that never cross players
+    same_player = player_ids[1:] == player_ids[:-1]
+    prev_sprinting = np.zeros_like(is_sprinting)
+    prev_sprinting[1:] = is_sprinting[:-1] & same_player
+    next_sprinting = np.zeros_like(is_sprinting)
+    next_sprinting[:-1] = is_sprinting[1:] & same_player
+    starts = np.flatnonzero(is_sprinting & ~prev_sprinting)
+    ends = np.flatnonzero(is_sprinting & ~next_sprinting) + 1
+
+    # Minimum 0.6s
+    keep = (ends - starts) >= 6
+    starts, ends = starts[keep], ends[keep]
+
+    # Frames keep the tracking dtype; the midpoint sum is done in int64
+    frame_start = frames[starts]
+    frame_end = frames[ends - 1]
+    mid_frame = ((frame_start.astype(np.int64) + frame_end) // 2).astype(frames.dtype)
+    duration_s = (frame_end - frame_start + 1) / fps
+
+    # Smoothed speeds per sprint (NaNs excluded)
+    has_speed = ~np.isnan(speed_smooth)
+    speed_counts = segment_sums(has_speed.astype(np.int64), starts, ends)
+    speed_sums = segment_sums(np.where(has_speed, speed_smooth, 0.0), starts, ends)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_speed_kmh = speed_sums / speed_counts
+
+    # Distance from average speed
+    distance_m = (avg_speed_kmh / 3.6) * duration_s
+
+    # Realistic validation based on PSV99 data:
+    # - Average sprint speed should be 25-29 km/h (sustained effort)
+    # - Max sprint speed should be 26-31 km/h (brief peak)
+    # - Meaningful sprint distance, as SkillCorner defines sprint velocity as 7 m/s
+    keep = (
+        (speed_counts >= 4)
+        & (avg_speed_kmh >= 24.5) & (avg_speed_kmh <= 29)
+        & (distance_m >= 7.0)
+    )
+
+    # Use conservative percentiles: 90th percentile, only for sprints still in play
+    max_speed_kmh = np.full(len(starts), np.nan)
+    max_speed_kmh[keep] = segment_quantiles(speed_smooth, starts[keep], ends[keep], 0.90)
+
+    keep &= (max_speed_kmh >= 26.0) & (max_speed_kmh <= 33.0)
+    kept = np.flatnonzero(keep)
+
+    # Built once from typed columns; no per-sprint rows or dtype inference
+    return pd.DataFrame({
+        "match_id": np.full(len(kept), match_id, dtype=object),
+        "player_id": player_ids[starts[kept]],
+        "frame_start": frame_start[kept],
+        "frame_end": frame_end[kept],
+        "mid_frame": mid_frame[kept],
+        "duration_s": duration_s[kept],
+        "distance_m": distance_m[kept],
+        "avg_sprint_speed_kmh": avg_speed_kmh[kept],
+        "max_sprint_speed_kmh": max_speed_kmh[kept],
+        "sprint_id": np.arange(len(kept)),
+    })
+
+
+def detect_match_sprints(match_id: str) -> pd.DataFrame:
+    """Load flattened tracking for one match and detect its sprints."""
+    return detect_sprints(load_player_tracking(match_id), match_id)
+
+
+def detect_sprints_for_matches(
+    match_ids: list[str],
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Detect sprints across matches, one worker process per match.
+
+    Matches that fail to load or process are skipped with a warning; raises
+    RuntimeError naming them if none succeed. Returns all sprints in
+    match_ids order, with sprint_id unique per match.
+    """
+    if not match_ids:
+        raise ValueError("match_ids is empty")
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    detected = {}
+
+    # Detection is a single vectorised pass per match, so parallelise across matches
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(detect_match_sprints, match_id): match_id for match_id in match_ids}
+
+        for future in as_completed(futures):
+            match_id = futures[future]
+            try:
+                detected[match_id] = future.result()
+                logger.info(f"Detected {len(detected[match_id])} sprints in match {match_id}")
+            except Exception as e:
+                logger.warning(f"Skipping match {match_id}: {e}")
+
+    if not detected:
+        raise RuntimeError(f"Sprint detection failed for every match: {', '.join(match_ids)}")
+
+    # Keep the original match order regardless of completion order
+    return pd.concat(
+        [detected[match_id] for match_id in match_ids if match_id in detected],
+        ignore_index=True,
+    )
 
 
 def enrich_sprints_with_phases(
@@ -148,53 +331,63 @@ def enrich_sprints_with_phases(
     
     Uses mid_frame to avoid edge cases where sprint spans multiple phases.
     """
-    enriched_sprints = []
-    
-    for _, sprint in sprints_df.iterrows():
-        match_id = sprint['match_id']
-        mid_frame = sprint['mid_frame']
-        
-        # Find matching phase
-        phase_match = phases_df[
-            (phases_df['match_id'] == match_id) &
-            (phases_df['frame_start'] <= mid_frame) &
-            (phases_df['frame_end'] >= mid_frame)
-        ]
-        
-        if len(phase_match) == 0:
-            # Sprint not in any phase - keep sprint but null phase fields
-            sprint_dict = sprint.to_dict()
-            sprint_dict.update({
-                'team_in_possession_phase_type': None,
-                'team_out_of_possession_phase_type': None,
-                'team_in_possession_id': None,
-                'possession_lead_to_shot': False,
-                'possession_lead_to_goal': False,
-                'third_end': None,
-                'channel_end': None,
-            })
+    phase_columns = {
+        'team_in_possession_phase_type': 'team_in_possession_phase_type',
+        'team_out_of_possession_phase_type': 'team_out_of_possession_phase_type',
+        'team_in_possession_id': 'team_in_possession_id',
+        'possession_lead_to_shot': 'team_possession_lead_to_shot',
+        'possession_lead_to_goal': 'team_possession_lead_to_goal',
+        'third_end': 'third_end',
+        'channel_end': 'channel_end',
+    }
+    outcome_columns = ['possession_lead_to_shot', 'possession_lead_to_goal']
+    available = {
+        column: phase_column
+        for column, phase_column in phase_columns.items()
+        if phase_column in phases_df.columns
+    }
+
+    # Phase bounds renamed so they don't clash with the sprint's own frame_start/frame_end
+    phases = phases_df[['match_id', 'frame_start', 'frame_end', *available.values()]].rename(
+        columns={
+            'frame_start': 'phase_frame_start',
+            'frame_end': 'phase_frame_end',
+            **{phase_column: column for column, phase_column in available.items()},
+        }
+    )
+    phases['phase_frame_start'] = phases['phase_frame_start'].astype(sprints_df['mid_frame'].dtype)
+    phases = phases.sort_values('phase_frame_start', kind='stable')
+
+    # Latest phase in the same match starting at or before mid_frame
+    order = np.argsort(sprints_df['mid_frame'].to_numpy(), kind='stable')
+    enriched_df = pd.merge_asof(
+        sprints_df.iloc[order].reset_index(drop=True),
+        phases,
+        left_on='mid_frame',
+        right_on='phase_frame_start',
+        by='match_id',
+        direction='backward',
+    )
+    enriched_df.index = order
+    enriched_df = enriched_df.sort_index()
+
+    # Sprint not in any phase (or the phase ended first) - keep sprint but null phase fields
+    matched = enriched_df['phase_frame_end'] >= enriched_df['mid_frame']
+    enriched_df = enriched_df.drop(columns=['phase_frame_start', 'phase_frame_end'])
+
+    for column in phase_columns:
+        if column not in available:
+            enriched_df[column] = False if column in outcome_columns else None
+        elif column in outcome_columns:
+            enriched_df[column] = enriched_df[column].where(matched, False).infer_objects()
         else:
-            phase = phase_match.iloc[0]
-            sprint_dict = sprint.to_dict()
-            sprint_dict.update({
-                'team_in_possession_phase_type': phase['team_in_possession_phase_type'],
-                'team_out_of_possession_phase_type': phase['team_out_of_possession_phase_type'],
-                'team_in_possession_id': phase['team_in_possession_id'],
-                'possession_lead_to_shot': phase.get('team_possession_lead_to_shot', False),
-                'possession_lead_to_goal': phase.get('team_possession_lead_to_goal', False),
-                'third_end': phase.get('third_end'),
-                'channel_end': phase.get('channel_end'),
-            })
-        
-        enriched_sprints.append(sprint_dict)
-    
-    enriched_df = pd.DataFrame(enriched_sprints)
-    
+            enriched_df[column] = enriched_df[column].where(matched)
+
+    enriched_df = enriched_df[[*sprints_df.columns, *phase_columns]]
+
     # Create derived flags
-    high_value_phases = {'create', 'finish', 'quick_break', 'transition'}
-    
     enriched_df['is_high_value_phase'] = (
-        enriched_df['team_in_possession_phase_type'].isin(high_value_phases)
+        enriched_df['team_in_possession_phase_type'].isin(HIGH_VALUE_PHASES)
     )
     
     # Need team_id to determine attacking vs defensive
@@ -220,6 +413,61 @@ def add_sprint_context_flags(sprints_df: pd.DataFrame) -> pd.DataFrame:
     return sprints_df
 
 
+def build_spark_session(
+    app_name: str,
+    driver_memory: str = "4g",
+    shuffle_partitions: int = 16,
+) -> SparkSession:
+    """
+    Local Spark session tuned for the player-match aggregations.
+
+    Per-match inputs are small, so the default 200 shuffle partitions are
+    mostly empty; AQE coalesces what's left and splits skewed join keys.
+    """
+    return (
+        SparkSession.builder
+        .appName(app_name)
+        .config("spark.driver.memory", driver_memory)
+        .config("spark.sql.adaptive.enabled", "true")
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "true")
+        .config("spark.sql.adaptive.skewJoin.enabled", "true")
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions))
+        .config("spark.serializer", "org.apache.spark.serializer.KryoSerializer")
+        .getOrCreate()
+    )
+
+
+def persist_for_reuse(sdf: SparkDataFrame) -> SparkDataFrame:
+    """
+    Persist a DataFrame that more than one action will read.
+
+    Spark recomputes the whole lineage for every action (count, aggregate,
+    toPandas), including re-serialising pandas input from the driver.
+    """
+    if sdf.is_cached:
+        return sdf
+    return sdf.persist(StorageLevel.MEMORY_AND_DISK)
+
+
+def select_for_aggregation(
+    sdf: SparkDataFrame,
+    group_cols: list[str],
+    value_cols: list[str],
+    flag_cols: list[str],
+) -> SparkDataFrame:
+    """
+    Project only the columns an aggregation reads, casting flags to byte.
+
+    Done once before groupBy so unused columns never reach the shuffle and
+    the aggregations can mean/sum the 1-byte flags directly.
+    """
+    return sdf.select(
+        *group_cols,
+        *value_cols,
+        *[F.col(c).cast('byte').alias(c) for c in flag_cols],
+    )
+
+
 def aggregate_player_sprints(
     sprints_sdf: SparkDataFrame,
     player_meta_sdf: SparkDataFrame,
@@ -242,46 +490,52 @@ def aggregate_player_sprints(
     # Group by player-match
     group_cols = ['match_id', 'player_id']
     
+    # Only the columns used below; bool flags become bytes for the means
+    sprints_sdf = select_for_aggregation(
+        sprints_sdf,
+        group_cols,
+        ['sprint_id', 'distance_m', 'avg_sprint_speed_kmh', 'max_sprint_speed_kmh'],
+        [
+            'is_high_value_phase', 'is_attacking_sprint', 'is_defensive_sprint',
+            'possession_lead_to_shot', 'possession_lead_to_goal', 'in_attacking_third',
+        ],
+    )
+    
     player_sprints = sprints_sdf.groupBy(group_cols).agg(
         F.count('sprint_id').alias('sprint_count'),
         F.sum('distance_m').alias('sprint_distance_m'),
         F.mean('avg_sprint_speed_kmh').alias('avg_sprint_speed_kmh'),
         F.mean('max_sprint_speed_kmh').alias('max_sprint_speed_kmh'),
         
-        # Context quality metrics (convert bool to int for mean)
-        F.mean(F.col('is_high_value_phase').cast('int')).alias('high_value_sprint_pct'),
-        F.mean(F.col('is_attacking_sprint').cast('int')).alias('attacking_sprint_pct'),
-        F.mean(F.col('is_defensive_sprint').cast('int')).alias('defensive_sprint_pct'),
+        # Context quality metrics
+        F.mean('is_high_value_phase').alias('high_value_sprint_pct'),
+        F.mean('is_attacking_sprint').alias('attacking_sprint_pct'),
+        F.mean('is_defensive_sprint').alias('defensive_sprint_pct'),
         
         # Outcome linkage
-        F.mean(F.col('possession_lead_to_shot').cast('int')).alias('sprints_in_shot_possessions_pct'),
-        F.mean(F.col('possession_lead_to_goal').cast('int')).alias('sprints_in_goal_possessions_pct'),
+        F.mean('possession_lead_to_shot').alias('sprints_in_shot_possessions_pct'),
+        F.mean('possession_lead_to_goal').alias('sprints_in_goal_possessions_pct'),
         
         # Spatial context
-        F.mean(F.col('in_attacking_third').cast('int')).alias('sprints_in_attacking_third_pct'),
+        F.mean('in_attacking_third').alias('sprints_in_attacking_third_pct'),
     )
     
     # Join with player metadata to get minutes_played and position
+    # (one row per player-match, small enough to broadcast)
     player_sprints = player_sprints.join(
-        player_meta_sdf,
+        F.broadcast(player_meta_sdf),
         on=['match_id', 'player_id'],
         how='left'
     )
     
-    # Calculate per-90 metrics
-    player_sprints = player_sprints.withColumn(
-        'sprints_per_90',
-        (F.col('sprint_count') * 90) / F.col('minutes_played')
-    )
-    
-    player_sprints = player_sprints.withColumn(
-        'sprint_distance_per_90',
-        (F.col('sprint_distance_m') * 90) / F.col('minutes_played')
-    )
+    # Calculate per-90 metrics in a single projection
+    sprints_per_90 = (F.col('sprint_count') * 90) / F.col('minutes_played')
     
-    player_sprints = player_sprints.withColumn(
-        'high_value_sprints_per_90',
-        F.col('sprints_per_90') * F.col('high_value_sprint_pct')
+    player_sprints = player_sprints.select(
+        '*',
+        sprints_per_90.alias('sprints_per_90'),
+        ((F.col('sprint_distance_m') * 90) / F.col('minutes_played')).alias('sprint_distance_per_90'),
+        (sprints_per_90 * F.col('high_value_sprint_pct')).alias('high_value_sprints_per_90'),
     )
     
     # Filter minimum minutes
@@ -316,6 +570,13 @@ def aggregate_off_ball_runs(
 
     group_cols = ["match_id", "player_id"]
 
+    runs_sdf = select_for_aggregation(
+        runs_sdf,
+        group_cols,
+        ["event_id", "xthreat", "speed_avg", "n_opponents_overtaken", "event_subtype"],
+        ["dangerous"],
+    )
+
     player_runs = runs_sdf.groupBy(group_cols).agg(
         F.count("event_id").alias("run_count"),
 
@@ -324,7 +585,7 @@ def aggregate_off_ball_runs(
         F.max("xthreat").alias("max_xthreat"),
 
         # Quality / danger
-        F.mean(F.col("dangerous").cast("int")).alias("high_value_run_pct"),
+        F.mean("dangerous").alias("high_value_run_pct"),
 
         # Physical & style
         F.mean("speed_avg").alias("avg_run_speed"),
@@ -341,25 +602,19 @@ def aggregate_off_ball_runs(
 
     # Join player metadata (minutes, position, team info, etc.)
     player_runs = player_runs.join(
-        player_meta_sdf,
+        F.broadcast(player_meta_sdf),
         on=["match_id", "player_id"],
         how="left",
     )
 
-    # Per-90 metrics
-    player_runs = player_runs.withColumn(
-        "runs_per_90",
-        (F.col("run_count") / F.col("minutes_played")) * 90.0,
-    )
-
-    player_runs = player_runs.withColumn(
-        "high_value_runs_per_90",
-        F.col("runs_per_90") * F.col("high_value_run_pct"),
-    )
+    # Per-90 metrics in a single projection
+    runs_per_90 = (F.col("run_count") / F.col("minutes_played")) * 90.0
 
-    player_runs = player_runs.withColumn(
-        "threat_per_90",
-        F.col("runs_per_90") * F.col("avg_xthreat"),
+    player_runs = player_runs.select(
+        "*",
+        runs_per_90.alias("runs_per_90"),
+        (runs_per_90 * F.col("high_value_run_pct")).alias("high_value_runs_per_90"),
+        (runs_per_90 * F.col("avg_xthreat")).alias("threat_per_90"),
     )
 
     # Filter out tiny samples
@@ -413,29 +668,40 @@ def aggregate_pressing_impact(
     
     group_cols = ['match_id', 'player_id']
     
+    pressing_sdf = select_for_aggregation(
+        pressing_sdf,
+        group_cols,
+        ['event_id', 'team_out_of_possession_phase_type', 'event_subtype'],
+        [
+            'direct_regain', 'indirect_regain', 'any_regain',
+            'direct_disruption', 'indirect_disruption', 'any_disruption',
+            'successful_press', 'lead_to_shot', 'lead_to_goal',
+        ],
+    )
+    
     player_pressing = pressing_sdf.groupBy(group_cols).agg(
         F.count('event_id').alias('pressing_action_count'),
         
         # Regain metrics
-        F.sum(F.col('direct_regain').cast('int')).alias('direct_regain_count'),
-        F.sum(F.col('indirect_regain').cast('int')).alias('indirect_regain_count'),
-        F.sum(F.col('any_regain').cast('int')).alias('total_regain_count'),
-        F.mean(F.col('any_regain').cast('int')).alias('regain_rate'),
+        F.sum('direct_regain').alias('direct_regain_count'),
+        F.sum('indirect_regain').alias('indirect_regain_count'),
+        F.sum('any_regain').alias('total_regain_count'),
+        F.mean('any_regain').alias('regain_rate'),
         
         # Disruption metrics
-        F.sum(F.col('direct_disruption').cast('int')).alias('direct_disruption_count'),
-        F.sum(F.col('indirect_disruption').cast('int')).alias('indirect_disruption_count'),
-        F.sum(F.col('any_disruption').cast('int')).alias('total_disruption_count'),
-        F.mean(F.col('any_disruption').cast('int')).alias('disruption_rate'),
+        F.sum('direct_disruption').alias('direct_disruption_count'),
+        F.sum('indirect_disruption').alias('indirect_disruption_count'),
+        F.sum('any_disruption').alias('total_disruption_count'),
+        F.mean('any_disruption').alias('disruption_rate'),
         
         # Overall success
-        F.sum(F.col('successful_press').cast('int')).alias('successful_press_count'),
-        F.mean(F.col('successful_press').cast('int')).alias('press_success_rate'),
+        F.sum('successful_press').alias('successful_press_count'),
+        F.mean('successful_press').alias('press_success_rate'),
         
         # Outcome quality
-        F.sum(F.col('lead_to_shot').cast('int')).alias('presses_leading_to_shot'),
-        F.sum(F.col('lead_to_goal').cast('int')).alias('presses_leading_to_goal'),
-        F.mean(F.col('lead_to_shot').cast('int')).alias('shot_creation_rate'),
+        F.sum('lead_to_shot').alias('presses_leading_to_shot'),
+        F.sum('lead_to_goal').alias('presses_leading_to_goal'),
+        F.mean('lead_to_shot').alias('shot_creation_rate'),
         
         # Phase breakdown
         F.sum(
@@ -456,30 +722,24 @@ def aggregate_pressing_impact(
     
     # Join metadata
     player_pressing = player_pressing.join(
-        player_meta_sdf,
+        F.broadcast(player_meta_sdf),
         on=['match_id', 'player_id'],
         how='left'
     )
     
-    # Per-90 metrics
-    player_pressing = player_pressing.withColumn(
-        'pressing_actions_per_90',
-        (F.col('pressing_action_count') * 90) / F.col('minutes_played')
-    )
-    
-    player_pressing = player_pressing.withColumn(
-        'regains_per_90',
-        (F.col('total_regain_count') * 90) / F.col('minutes_played')
-    )
-    
-    player_pressing = player_pressing.withColumn(
-        'successful_presses_per_90',
-        (F.col('successful_press_count') * 90) / F.col('minutes_played')
-    )
-    
-    player_pressing = player_pressing.withColumn(
-        'counter_presses_per_90',
-        (F.col('counter_press_count') * 90) / F.col('minutes_played')
+    # Per-90 metrics in a single projection
+    per_90 = {
+        'pressing_actions_per_90': 'pressing_action_count',
+        'regains_per_90': 'total_regain_count',
+        'successful_presses_per_90': 'successful_press_count',
+        'counter_presses_per_90': 'counter_press_count',
+    }
+    player_pressing = player_pressing.select(
+        '*',
+        *[
+            ((F.col(count_col) * 90) / F.col('minutes_played')).alias(name)
+            for name, count_col in per_90.items()
+        ],
     )
     
     # Filter minimum volume
@@ -2,13 +2,63 @@
 Helper functions and widgets for player performance visualisation.
 """
 
+import asyncio
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import ipywidgets as widgets
-from ipywidgets import Dropdown, IntSlider
+from ipywidgets import Combobox, Dropdown, IntSlider
 import plotly.graph_objects as go
 from IPython.display import display
 
+# Idle time before the comparison widget re-renders after a control change
+PLOT_DEBOUNCE_SECONDS = 0.15
+
+# Low-cardinality labels that are grouped on and compared against repeatedly
+CATEGORICAL_COLUMNS = ("position_group", "team_name", "player_short_name")
+
+
+def prepare_metrics_frame(df, metric_families):
+    """
+    Return df with the label columns stored as categoricals and the float
+    metric columns of metric_families as float32 (no-op if they already are).
+    Minutes, volume and id columns keep their dtype so the eligibility
+    thresholds compare exactly.
+    """
+    metric_columns = {m for cfg in metric_families.values() for m in cfg["metrics"]}
+    to_convert = {
+        c: "category" for c in CATEGORICAL_COLUMNS
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype)
+    }
+    to_convert.update({
+        c: "float32" for c in df.columns
+        if c in metric_columns and df[c].dtype == np.float64
+    })
+    if not to_convert:
+        return df
+    return df.astype(to_convert)
+
+
+@contextmanager
+def paused_observers(handler, *controls):
+    """
+    Detach handler from the controls' value changes and batch their front-end
+    syncs, so programmatic updates inside the block fire no callbacks.
+    """
+    for control in controls:
+        control.unobserve(handler, 'value')
+    try:
+        with ExitStack() as stack:
+            for control in controls:
+                stack.enter_context(control.hold_sync())
+            yield
+    finally:
+        for control in controls:
+            control.observe(handler, 'value')
+
 
 def get_eligible_players(df, metric_family, min_minutes, min_volume, metric_families):
     """Filter to players with sufficient minutes and event volume."""
@@ -16,12 +66,11 @@ def get_eligible_players(df, metric_family, min_minutes, min_volume, metric_fami
     metrics = cfg["metrics"]
     volume_col = cfg["volume_col"]
     
-    subset = df.copy()
-    subset = subset[subset["minutes_played"] >= min_minutes]
-    subset = subset[subset[volume_col] >= min_volume]
-    subset = subset.dropna(subset=metrics, how="all")
+    # One combined mask, indexed once; no intermediate frames
+    thresholds = (df["minutes_played"] >= min_minutes) & (df[volume_col] >= min_volume)
+    mask = thresholds.to_numpy() & df[metrics].notna().any(axis=1).to_numpy()
     
-    return subset
+    return df.loc[mask]
 
 
 def add_percentiles(eligible_df, metric_family, cohort_mode, metric_families):
@@ -42,21 +91,61 @@ def add_percentiles(eligible_df, metric_family, cohort_mode, metric_families):
     else:
         raise ValueError("Unknown cohort_mode")
     
+    # Integer cohort codes (-1 where a key is missing, as groupby drops those)
+    if group_keys is None:
+        codes = np.zeros(len(df_pct), dtype=np.int64)
+    else:
+        codes = df_pct.groupby(group_keys, sort=False, observed=True).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    
     # Compute percentiles
     for m in metrics:
-        if group_keys is None:
-            ranks = df_pct[m].rank(pct=True)
-        else:
-            ranks = df_pct.groupby(group_keys)[m].rank(pct=True)
-        df_pct[m + "_pctile"] = (ranks * 100).round(1)
+        values = df_pct[m].to_numpy(na_value=np.nan)  # keeps float32 columns at float32
+        pctiles = group_percentile_ranks(values, codes)
+        
+        # Scale and round in place; the ranks array is ours to reuse
+        np.multiply(pctiles, 100, out=pctiles)
+        np.round(pctiles, 1, out=pctiles)
+        df_pct[m + "_pctile"] = pctiles
     
     return df_pct
 
 
+def group_percentile_ranks(values, codes):
+    """
+    Percentile rank of each value within its group, matching
+    groupby().rank(pct=True): ties share their average rank and NaN values
+    or rows with a negative group code get NaN.
+    """
+    ranks = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values) & (codes >= 0))
+    if len(valid) == 0:
+        return ranks
+    
+    # One sort by (group, value) instead of a sort per group
+    order = valid[np.lexsort((values[valid], codes[valid]))]
+    sorted_codes = codes[order]
+    sorted_values = values[order]
+    
+    # Runs of tied values within a group share the average of their positions
+    new_group = np.r_[True, np.diff(sorted_codes) != 0]
+    new_run = new_group | np.r_[True, np.diff(sorted_values) != 0]
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.r_[run_starts[1:], len(order)]
+    average_positions = ((run_starts + run_ends - 1) / 2)[np.cumsum(new_run) - 1]
+    
+    # Offset by each group's first position and scale by its size
+    group_starts = np.flatnonzero(new_group)
+    group_sizes = np.diff(np.r_[group_starts, len(order)])
+    group_ids = np.cumsum(new_group) - 1
+    ranks[order] = (average_positions - group_starts[group_ids] + 1) / group_sizes[group_ids]
+    
+    return ranks
+
+
 def get_comparison_baseline(df_pct, player_row, comparison_target, metric_family, metric_families):
     """
     Build a comparison baseline (average) based on target type.
-    Returns a dict-like row with same structure as player_row.
+    Returns a dict keyed like player_row's metric and _pctile columns.
     
     KEY FIX: For averages, we need to:
     1. Take mean of RAW metric values (not percentiles)
@@ -66,114 +155,158 @@ def get_comparison_baseline(df_pct, player_row, comparison_target, metric_family
     metrics = cfg["metrics"]
     
     if comparison_target == "Position-group average":
-        mask = df_pct['position_group'] == player_row['position_group']
-        cohort = df_pct[mask]
+        cohort_values = {'position_group': player_row['position_group']}
         label = f"{player_row['position_group']} avg"
         
     elif comparison_target == "Team average":
-        mask = df_pct['team_name'] == player_row['team_name']
-        cohort = df_pct[mask]
+        cohort_values = {'team_name': player_row['team_name']}
         label = f"{player_row['team_name']} avg"
         
     elif comparison_target == "Team + position-group average":
-        mask = (df_pct['position_group'] == player_row['position_group']) & \
-               (df_pct['team_name'] == player_row['team_name'])
-        cohort = df_pct[mask]
+        cohort_values = {
+            'position_group': player_row['position_group'],
+            'team_name': player_row['team_name'],
+        }
         label = f"{player_row['team_name']} {player_row['position_group']} avg"
     else:
         return None, None
     
-    # Build baseline with RAW means
-    baseline = {}
-    for m in metrics:
-        # Mean of raw metric values
-        baseline[m] = cohort[m].mean()
-        
-        # Calculate percentile: where does this mean sit in the cohort distribution?
-        raw_values = cohort[m].dropna()
-        if len(raw_values) > 0:
-            # Count how many values are <= the mean
-            pct_below = (raw_values <= baseline[m]).sum() / len(raw_values)
-            baseline[m + '_pctile'] = round(pct_below * 100, 1)
-        else:
-            baseline[m + '_pctile'] = 50.0  # Fallback
-    
-    return pd.Series(baseline), label
+    mask = np.ones(len(df_pct), dtype=bool)
+    for col, value in cohort_values.items():
+        mask &= (df_pct[col] == value).to_numpy()
+    cohort = df_pct[mask]
+    
+    # Build baseline with RAW means, all metrics at once
+    raw = cohort[metrics].to_numpy(dtype=float, na_value=np.nan)
+    counts = np.count_nonzero(~np.isnan(raw), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.nansum(raw, axis=0) / counts
+    
+    # Percentile: where the mean sits in each column's sorted non-null values
+    sorted_raw = np.sort(raw, axis=0)  # NaNs sort to the end
+    pctiles = np.full(len(metrics), 50.0)  # Fallback for empty columns
+    for j in np.flatnonzero(counts):
+        n_below = np.searchsorted(sorted_raw[:counts[j], j], means[j], side='right')
+        pctiles[j] = np.round(n_below / counts[j] * 100, 1)
+    
+    baseline = dict(zip(
+        list(metrics) + [m + '_pctile' for m in metrics],
+        np.concatenate([means, pctiles]),
+    ))
+    
+    return baseline, label
+
+
+def prepare_families(df, metric_families, min_minutes):
+    """
+    Eligible players for every metric family, at the family's default volume
+    threshold. Build once and pass to the data quality, summary and scatter
+    builders so they share the filtering work.
+    """
+    df = prepare_metrics_frame(df, metric_families)
+    return {
+        family_name: get_eligible_players(df, family_name, min_minutes, cfg["min_volume_default"], metric_families)
+        for family_name, cfg in metric_families.items()
+    }
 
 
-def build_data_quality_table(df, metric_families, min_minutes_default):
+def build_data_quality_table(df, metric_families, min_minutes_default, families=None):
     """Show which position groups have the strongest data per metric family."""
+    if families is None:
+        families = prepare_families(df, metric_families, min_minutes_default)
     summary_rows = []
 
     for family_name, cfg in metric_families.items():
         volume_col = cfg["volume_col"]
-        min_volume = cfg["min_volume_default"]
 
         # Use family-level eligibility
-        eligible = get_eligible_players(df, family_name, min_minutes_default, min_volume, metric_families)
+        eligible = families[family_name]
 
         if eligible.empty:
             continue
 
-        grouped = eligible.groupby("position_group").agg(
-            player_count=("player_id", "nunique"),
-            mean_volume=(volume_col, "mean"),
-        )
+        # Integer codes for groups and players (-1 where missing, as groupby drops those).
+        # Groups are coded in sorted order so score ties resolve as the sorted groupby did
+        group_codes, groups = pd.factorize(eligible["position_group"], sort=True)
+        player_codes, players = pd.factorize(eligible["player_id"])
+        n_groups, n_players = len(groups), len(players)
+        has_group = group_codes >= 0
+
+        # Distinct players per group: unique (group, player) pairs counted by group
+        has_pair = has_group & (player_codes >= 0)
+        pairs = np.unique(group_codes[has_pair].astype(np.int64) * n_players + player_codes[has_pair])
+        player_count = np.bincount(pairs // n_players, minlength=n_groups)
+
+        # Mean volume per group over non-null volumes
+        volume = eligible[volume_col].to_numpy(dtype=float, na_value=np.nan)
+        has_volume = has_group & ~np.isnan(volume)
+        volume_sum = np.bincount(group_codes[has_volume], weights=volume[has_volume], minlength=n_groups)
+        volume_n = np.bincount(group_codes[has_volume], minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_volume = volume_sum / volume_n
 
         # Simple robustness score: more players * more events
-        grouped["score"] = grouped["player_count"] * grouped["mean_volume"]
+        score = player_count * mean_volume
 
-        best_row = grouped.sort_values("score", ascending=False).iloc[0]
-        best_position_group = best_row.name  # index label = position_group
+        # Skip the family if no group has a volume to score on
+        if np.isnan(score).all():
+            continue
+
+        best = np.nanargmax(score)
 
         summary_rows.append({
             "metric_family": family_name,
-            "best_position_group": best_position_group,
-            "player_count": int(best_row["player_count"]),
-            "mean_volume": round(best_row["mean_volume"], 1),
+            "best_position_group": groups[best],
+            "player_count": int(player_count[best]),
+            "mean_volume": round(mean_volume[best], 1),
         })
 
     return pd.DataFrame(summary_rows)
 
 
-def build_position_group_performance_summary(df, metric_families, min_minutes_default):
+def build_position_group_performance_summary(df, metric_families, min_minutes_default, families=None):
     """Show best performing position groups for each metric within each family."""
+    if families is None:
+        families = prepare_families(df, metric_families, min_minutes_default)
     all_summaries = {}
     
     for family_name, cfg in metric_families.items():
         metrics = cfg["metrics"]
         volume_col = cfg["volume_col"]
-        min_volume = cfg["min_volume_default"]
 
-        eligible = get_eligible_players(df, family_name, min_minutes_default, min_volume, metric_families)
+        eligible = families[family_name]
 
         summary_rows = []
 
-        for metric in metrics:
-            grouped = eligible.groupby("position_group").agg(
-                player_count=("player_id", "nunique"),
-                total_volume=(volume_col, "sum"),
-                mean_volume=(volume_col, "mean"),
-                mean_metric=(metric, "mean"),
-                median_metric=(metric, "median"),
-            )
+        # One grouper for the volume stats and every metric in the family
+        grouped = eligible.groupby("position_group", observed=True).agg({
+            "player_id": "nunique",
+            volume_col: ["sum", "mean"],
+            **{metric: ["mean", "median"] for metric in metrics},
+        })
 
+        for metric in metrics:
             if len(grouped) == 0:
                 continue
 
+            # Skip metrics no group has a value for
+            mean_metric = grouped[(metric, "mean")]
+            if mean_metric.isna().all():
+                continue
+
             # Rank groups purely by mean metric
-            best_row = grouped.sort_values("mean_metric", ascending=False).iloc[0]
-            best_group = best_row.name
+            best_group = mean_metric.idxmax()
+            best_row = grouped.loc[best_group]
 
             summary_rows.append({
                 "metric": metric,
                 "best_position_group": best_group,
-                "player_count": int(best_row["player_count"]),
-                "total_volume": round(best_row["total_volume"], 1),
-                "mean_volume": round(best_row["mean_volume"], 1),
-                "mean_metric": round(best_row["mean_metric"], 3),
-                "median_metric": round(best_row["median_metric"], 3),
-                "weighted_metric": round(best_row["mean_metric"], 3),
+                "player_count": int(best_row[("player_id", "nunique")]),
+                "total_volume": round(best_row[(volume_col, "sum")], 1),
+                "mean_volume": round(best_row[(volume_col, "mean")], 1),
+                "mean_metric": round(best_row[(metric, "mean")], 3),
+                "median_metric": round(best_row[(metric, "median")], 3),
+                "weighted_metric": round(best_row[(metric, "mean")], 3),
                 "score_type": "mean",
             })
 
@@ -184,6 +317,7 @@ def build_position_group_performance_summary(df, metric_families, min_minutes_de
 
 def create_comparison_widget(df, metric_families, min_minutes_default, min_sprints_default):
     """Main interactive player comparison interface."""
+    df = prepare_metrics_frame(df, metric_families)
     
     # UI controls
     metric_dropdown = Dropdown(
@@ -226,74 +360,114 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
         description="Compare to:"
     )
     
-    player1_dropdown = Dropdown(options=[], description="Player 1:")
-    player2_dropdown = Dropdown(options=[], description="Player 2:")
+    # Type-to-search boxes; the browser filters the options as the user types
+    player1_dropdown = Combobox(options=[], placeholder="Search player", ensure_option=True, description="Player 1:")
+    player2_dropdown = Combobox(options=[], placeholder="Search player", ensure_option=True, description="Player 2:")
     
     output = widgets.Output()
     
-    # Flags to control callback storms
-    updating_filters = {"active": False}
-    suppress_plot = {"active": False}
+    # Filter results are reused across callbacks; df is fixed for the widget's
+    # lifetime so the scalar filter values are enough to key the caches
+    @lru_cache(maxsize=32)
+    def cached_eligible(metric_family, min_minutes, min_volume):
+        return get_eligible_players(df, metric_family, min_minutes, min_volume, metric_families)
+
+    @lru_cache(maxsize=32)
+    def cached_filter_options(metric_family, min_minutes, min_volume, position_filter):
+        eligible = cached_eligible(metric_family, min_minutes, min_volume)
+        positions = ("All position groups",) + tuple(sorted(eligible['position_group'].unique()))
+        
+        # Apply position filter
+        if position_filter != "All position groups" and position_filter in positions:
+            eligible = eligible[eligible['position_group'] == position_filter]
+        
+        players = tuple(sorted(eligible['player_short_name'].unique()))
+        return eligible, positions, players
+
+    @lru_cache(maxsize=32)
+    def cached_percentiles(metric_family, min_minutes, min_volume, position_filter, cohort_mode):
+        # Reuse the position-filtered subset update_filters already built
+        eligible, _, _ = cached_filter_options(metric_family, min_minutes, min_volume, position_filter)
+        df_pct = add_percentiles(eligible, metric_family, cohort_mode, metric_families)
+        
+        # Player name -> row position, first occurrence wins for duplicate names
+        name_to_iloc = {}
+        for i, name in enumerate(df_pct['player_short_name'].to_numpy()):
+            name_to_iloc.setdefault(name, i)
+        return df_pct, name_to_iloc
+
+    @lru_cache(maxsize=64)
+    def cached_baseline(metric_family, min_minutes, min_volume, position_filter, cohort_mode,
+                        comparison_target, position_group, team_name):
+        # Keyed on the player's cohort, so players sharing one reuse its baseline
+        df_pct, _ = cached_percentiles(metric_family, min_minutes, min_volume, position_filter, cohort_mode)
+        player_row = {'position_group': position_group, 'team_name': team_name}
+        return get_comparison_baseline(df_pct, player_row, comparison_target, metric_family, metric_families)
+    
+    # Initial render is deferred until the controls are displayed
     initializing = {"active": True}
+    pending_plot = {"handle": None}
     
     def update_filters(*args):
         """Update dependent dropdowns when filters change."""
-        if updating_filters["active"]:
-            return
-        updating_filters["active"] = True
+        metric_family = metric_dropdown.value
+        min_minutes = min_minutes_slider.value
+        position_filter = position_dropdown.value
         
-        try:
-            metric_family = metric_dropdown.value
-            min_minutes = min_minutes_slider.value
-            min_volume = min_volume_slider.value
-            position_filter = position_dropdown.value
+        # Programmatic changes below must not re-enter this callback or the plot
+        with paused_observers(update_filters, min_volume_slider, position_dropdown), \
+                paused_observers(schedule_plot, player1_dropdown, player2_dropdown):
             
             # Update min_volume default without causing another filter run
             default_min_vol = metric_families[metric_family]["min_volume_default"]
             if min_volume_slider.value != default_min_vol:
                 min_volume_slider.value = default_min_vol
             
-            # Get eligible players
-            eligible = get_eligible_players(df, metric_family, min_minutes, min_volume_slider.value, metric_families)
+            # Position and player options for the eligible players
+            _, positions, players = cached_filter_options(
+                metric_family, min_minutes, min_volume_slider.value, position_filter
+            )
             
             # Update position filter options
-            positions = ["All position groups"] + sorted(eligible['position_group'].unique())
             position_dropdown.options = positions
             
-            # Apply position filter
-            if position_filter != "All position groups" and position_filter in eligible['position_group'].values:
-                eligible = eligible[eligible['position_group'] == position_filter]
-            
-            # Update player dropdowns safely
-            players = sorted(eligible['player_short_name'].unique())
+            # Update player search boxes
+            player1_dropdown.value = ""
+            player2_dropdown.value = ""
+
+            player1_dropdown.options = players
+            player2_dropdown.options = players
             
-            suppress_plot["active"] = True
-            try:
-                player1_dropdown.value = None
-                player2_dropdown.value = None
-
-                player1_dropdown.options = players
-                player2_dropdown.options = players
-                
-                if len(players) > 0:
-                    player1_dropdown.value = players[0]
-                    if len(players) > 1:
-                        player2_dropdown.value = players[1]
-                    else:
-                        player2_dropdown.value = players[0]
-            finally:
-                suppress_plot["active"] = False
-        
-        finally:
-            updating_filters["active"] = False
+            if len(players) > 0:
+                player1_dropdown.value = players[0]
+                if len(players) > 1:
+                    player2_dropdown.value = players[1]
+                else:
+                    player2_dropdown.value = players[0]
         
         # Only plot if we're not initializing
         if not initializing["active"]:
+            schedule_plot()
+    
+    def schedule_plot(*args):
+        """Coalesce bursts of control changes into one render after a short idle."""
+        if initializing["active"]:
+            return
+        
+        if pending_plot["handle"] is not None:
+            pending_plot["handle"].cancel()
+        
+        # Outside a running event loop (e.g. plain Python) render straight away
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
             update_plot()
+            return
+        pending_plot["handle"] = loop.call_later(PLOT_DEBOUNCE_SECONDS, update_plot)
     
     def update_plot(*args):
         """Render the comparison plot."""
-        if suppress_plot["active"] or initializing["active"]:
+        if initializing["active"]:
             return
         
         with output:
@@ -311,36 +485,33 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
             if not player1_name or not player2_name:
                 return
             
-            # Get eligible subset
-            eligible = get_eligible_players(df, metric_family, min_minutes, min_volume, metric_families)
-            if position_filter != "All position groups":
-                eligible = eligible[eligible['position_group'] == position_filter]
+            # Eligible subset with percentiles
+            df_pct, name_to_iloc = cached_percentiles(metric_family, min_minutes, min_volume, position_filter, cohort_mode)
             
-            # Add percentiles
-            df_pct = add_percentiles(eligible, metric_family, cohort_mode, metric_families)
+            cfg = metric_families[metric_family]
+            metrics = cfg["metrics"]
+            pctile_cols = [m + '_pctile' for m in metrics]
             
             # Get player data
-            p1_matches = df_pct[df_pct['player_short_name'] == player1_name]
-            if len(p1_matches) == 0:
+            if player1_name not in name_to_iloc:
                 print(f"No data for {player1_name}")
                 return
-            p1 = p1_matches.iloc[0]
+            p1 = df_pct.iloc[name_to_iloc[player1_name]]
+            p1_r = p1[pctile_cols].to_numpy(dtype=float).tolist()
             
             # Get comparison target
             if comparison_target == "Individual player":
-                p2_matches = df_pct[df_pct['player_short_name'] == player2_name]
-                if len(p2_matches) == 0:
+                if player2_name not in name_to_iloc:
                     print(f"No data for {player2_name}")
                     return
-                p2 = p2_matches.iloc[0]
                 p2_label = player2_name
-                p2_data = p2
+                p2_r = df_pct.iloc[name_to_iloc[player2_name]][pctile_cols].to_numpy(dtype=float).tolist()
             else:
-                p2_data, p2_label = get_comparison_baseline(df_pct, p1, comparison_target, metric_family, metric_families)
-            
-            # Build plot - radar only
-            cfg = metric_families[metric_family]
-            metrics = cfg["metrics"]
+                p2_data, p2_label = cached_baseline(
+                    metric_family, min_minutes, min_volume, position_filter, cohort_mode,
+                    comparison_target, p1['position_group'], p1['team_name'],
+                )
+                p2_r = [float(p2_data[c]) for c in pctile_cols]
             
             fig = go.Figure()
             
@@ -348,7 +519,7 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
             categories = [m.replace('_', ' ').title() for m in metrics]
             
             fig.add_trace(go.Scatterpolar(
-                r=[p1[m + '_pctile'] for m in metrics],
+                r=p1_r,
                 theta=categories,
                 fill='toself',
                 name=player1_name,
@@ -356,7 +527,7 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
             ))
             
             fig.add_trace(go.Scatterpolar(
-                r=[p2_data[m + '_pctile'] for m in metrics],
+                r=p2_r,
                 theta=categories,
                 fill='toself',
                 name=p2_label,
@@ -384,16 +555,15 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
     min_volume_slider.observe(update_filters, 'value')
     position_dropdown.observe(update_filters, 'value')
     
-    comparison_dropdown.observe(update_plot, 'value')
-    cohort_dropdown.observe(update_plot, 'value')
-    player1_dropdown.observe(update_plot, 'value')
-    player2_dropdown.observe(update_plot, 'value')
+    comparison_dropdown.observe(schedule_plot, 'value')
+    cohort_dropdown.observe(schedule_plot, 'value')
+    player1_dropdown.observe(schedule_plot, 'value')
+    player2_dropdown.observe(schedule_plot, 'value')
     
     # Initial setup with blocking
     initializing["active"] = True
     update_filters()
     initializing["active"] = False
-    update_plot()
     
     # Layout
     controls = widgets.VBox([
@@ -404,19 +574,28 @@ def create_comparison_widget(df, metric_families, min_minutes_default, min_sprin
     ])
     
     display(controls, output)
+    
+    # First render goes through the debouncer so it lands after the widget is shown
+    schedule_plot()
 
 
-def build_performance_scatter(df, metric_families):
-    """Interactive scatter plot showing player performance across key metrics."""
+def build_performance_scatter(df, metric_families, families=None):
+    """
+    Interactive scatter plot showing player performance across key metrics.
+    families from prepare_families can be reused if built with min_minutes <= 60.
+    """
     
     # Use same filters as heatmap for consistency
     min_minutes = 60
     
     # Get players eligible for each metric family with their percentiles
+    if families is None:
+        families = prepare_families(df, metric_families, min_minutes)
     family_dfs = {}
     
     for family_name, cfg in metric_families.items():
-        eligible = get_eligible_players(df, family_name, min_minutes, cfg["min_volume_default"], metric_families)
+        eligible = families[family_name]
+        eligible = eligible.loc[eligible["minutes_played"].to_numpy() >= min_minutes]
         eligible = add_percentiles(eligible, family_name, "Same position_group", metric_families)
         
         # Aggregate to player level - keep raw values AND percentiles
@@ -433,16 +612,14 @@ def build_performance_scatter(df, metric_families):
         
         family_dfs[family_name] = player_agg
     
-    # Merge all families into a combined player-level dataframe
-    family_names = list(metric_families.keys())
-    combined = family_dfs[family_names[0]].copy()
-    
-    for family_name in family_names[1:]:
-        combined = combined.merge(
-            family_dfs[family_name],
-            on=['player_id', 'player_short_name', 'team_name', 'position_group'],
-            how='outer'
-        )
+    # Combine all families into a player-level dataframe with one outer join on the shared keys
+    player_keys = ['player_id', 'player_short_name', 'team_name', 'position_group']
+    combined = pd.concat(
+        [family_df.set_index(player_keys) for family_df in family_dfs.values()],
+        axis=1,
+        join='outer',
+        sort=True,
+    ).reset_index()
     
     # Key percentile metrics used for composite score (one per family)
     heatmap_metrics = {
@@ -456,11 +633,12 @@ def build_performance_scatter(df, metric_families):
     
     # Top 5 per position group for highlighting
     top_players = (
-        combined.groupby('position_group', group_keys=False)
-        .apply(lambda x: x.nlargest(5, 'composite_score'))
-        .reset_index(drop=True)
+        combined.dropna(subset=['position_group', 'composite_score'])
+        .sort_values('composite_score', ascending=False, kind='stable')
+        .groupby('position_group', sort=False, observed=True)
+        .head(5)
     )
-    top_player_ids = set(top_players['player_id'])
+    top_player_ids = set(top_players['player_id'].to_numpy())
     
     # For each view, explicitly define (x, y) and labels
     metric_views = {
@@ -484,37 +662,52 @@ def build_performance_scatter(df, metric_families):
         }
     }
     
+    # Per-view plot data, split into highlighted and background players once so
+    # switching views only redraws
+    view_cache = {}
+    for metric_label, view in metric_views.items():
+        # Filter to players with valid data for both axes
+        plot_data = combined.dropna(subset=[view['x_column'], view['y_column']])
+        x = plot_data[view['x_column']].to_numpy(dtype=float)
+        y = plot_data[view['y_column']].to_numpy(dtype=float)
+        
+        # Mark highlighted players
+        is_top = plot_data['player_id'].isin(top_player_ids).to_numpy()
+        
+        view_cache[metric_label] = {
+            'n_players': len(plot_data),
+            'top_x': x[is_top],
+            'top_y': y[is_top],
+            'top_names': plot_data['player_short_name'].to_numpy()[is_top],
+            'rest_x': x[~is_top],
+            'rest_y': y[~is_top],
+            # Sample means for reference lines
+            'x_mean': x.mean() if len(x) else np.nan,
+            'y_mean': y.mean() if len(y) else np.nan,
+        }
+    
     def plot_scatter(metric_label):
         """Update scatter plot based on selected metric view."""
         plt.close('all')
         
         view = metric_views[metric_label]
-        x_column = view['x_column']
-        y_column = view['y_column']
         x_label = view['x_label']
         y_label = view['y_label']
         
-        # Filter to players with valid data for both axes
-        plot_data = combined.dropna(subset=[x_column, y_column]).copy()
-        
-        if len(plot_data) == 0:
+        cached = view_cache[metric_label]
+        if cached['n_players'] == 0:
             print(f"No valid data for {metric_label}")
             return
         
-        # Mark highlighted players
-        plot_data['is_top'] = plot_data['player_id'].isin(top_player_ids)
-        
-        # Sample means for reference lines
-        x_mean = plot_data[x_column].mean()
-        y_mean = plot_data[y_column].mean()
+        x_mean = cached['x_mean']
+        y_mean = cached['y_mean']
         
         fig, ax = plt.subplots(figsize=(12, 8))
         
         # Background players
-        non_top = plot_data[~plot_data['is_top']]
         ax.scatter(
-            non_top[x_column],
-            non_top[y_column],
+            cached['rest_x'],
+            cached['rest_y'],
             c='#d3d3d3',
             s=80,
             alpha=0.4,
@@ -522,10 +715,9 @@ def build_performance_scatter(df, metric_families):
         )
         
         # Highlighted players
-        top = plot_data[plot_data['is_top']]
         ax.scatter(
-            top[x_column],
-            top[y_column],
+            cached['top_x'],
+            cached['top_y'],
             c='#2ecc71',
             s=120,
             alpha=0.9,
@@ -535,10 +727,10 @@ def build_performance_scatter(df, metric_families):
         )
         
         # Labels for highlighted players
-        for _, row in top.iterrows():
+        for name, x, y in zip(cached['top_names'], cached['top_x'], cached['top_y']):
             ax.annotate(
-                row['player_short_name'],
-                xy=(row[x_column], row[y_column]),
+                name,
+                xy=(x, y),
                 xytext=(8, 8),
                 textcoords='offset points',
                 fontsize=9,